@@ -9,16 +9,107 @@
 # Unless required by applicable law or agreed to in writing, software distributed under the License
 # is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
 # or implied.
+import atexit
+import hashlib
+import io
+import json
 import logging
 import asyncio
+import os
+import random
+import threading
+import time
+import types
+from functools import cached_property
 
-from openai import OpenAI, AsyncOpenAI, AzureOpenAI, AsyncAzureOpenAI, NOT_GIVEN
+import httpx
 
-from kag.interface import LLMClient
-from typing import Callable, Optional
+try:
+    from json_repair import loads
+except:  # noqa
+    from json import loads
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+try:
+    import orjson
+
+    def _stable_dumps(obj) -> bytes:
+        """Serializes to canonical JSON bytes for hashing and size estimates."""
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS, default=str)
+
+    _json_loads = orjson.loads
+
+except ImportError:
+
+    def _stable_dumps(obj) -> bytes:
+        return json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str).encode(
+            "utf-8"
+        )
+
+    _json_loads = json.loads
+
+try:
+    import msgspec
+    from typing import List as _List, Optional as _Optional
+
+    class _SSEDelta(msgspec.Struct):
+        content: _Optional[str] = None
+
+    class _SSEChoice(msgspec.Struct):
+        delta: _Optional[_SSEDelta] = None
+
+    class _SSEChunk(msgspec.Struct):
+        choices: _List[_SSEChoice] = []
+
+    _SSE_DECODER = msgspec.json.Decoder(_SSEChunk)
+
+    def _decode_sse_content(data: str):
+        """Extracts the content delta from one SSE data frame."""
+        try:
+            chunk = _SSE_DECODER.decode(data)
+        except msgspec.DecodeError:
+            # Skip malformed frames like the JSON fallback below does instead
+            # of killing the whole stream.
+            return None
+        if not chunk.choices:
+            return None
+        delta = chunk.choices[0].delta
+        return delta.content if delta is not None else None
 
+except ImportError:
 
-from kag.interface.solver.reporter_abc import ReporterABC
+    def _decode_sse_content(data: str):
+        try:
+            chunk = _json_loads(data)
+        except ValueError:
+            return None
+        choices = chunk.get("choices") or []
+        if not choices:
+            return None
+        return (choices[0].get("delta") or {}).get("content")
+
+
+from openai import (
+    OpenAI,
+    AsyncOpenAI,
+    AzureOpenAI,
+    AsyncAzureOpenAI,
+    NOT_GIVEN,
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    BadRequestError,
+)
+
+from kag.interface import LLMClient
+from typing import AsyncIterator, Callable, Iterable, List, Union
+
+from kag.common.llm.response_cache import RESPONSE_CACHE_MANAGER
+from kag.common.rate_limiter import TOKEN_BUCKET_MANAGER
 
 logging.getLogger("openai").setLevel(logging.ERROR)
 logging.getLogger("httpx").setLevel(logging.ERROR)
@@ -27,6 +118,168 @@ logger = logging.getLogger(__name__)
 AzureADTokenProvider = Callable[[], str]
 
 
+class _Coalescer:
+    """
+    Buffers concurrent single-prompt requests for a short window and answers
+    each full buffer with one batched chat completion (see `_acall_batch`),
+    amortizing per-request overhead when many coroutines arrive together.
+
+    A coalescer is bound to one event loop because it parks callers on
+    loop-local futures.
+    """
+
+    def __init__(self, client, window: float, max_batch: int):
+        self.client = client
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._flush_task = None
+        self._run_tasks = set()
+
+    async def submit(self, prompt: str) -> str:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prompt, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_task is None:
+            self._flush_task = loop.create_task(self._delayed_flush())
+        return await future
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.window)
+        self._flush_task = None
+        self._flush()
+
+    def _flush(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.get_running_loop().create_task(self._run(pending))
+            self._run_tasks.add(task)
+            task.add_done_callback(self._run_tasks.discard)
+
+    async def _run(self, pending):
+        client = self.client
+        prompts = [prompt for prompt, _ in pending]
+        try:
+            answers = None
+            if len(prompts) > 1:
+                answers = await client._acall_batch(prompts)
+            if answers is not None:
+                for prompt, answer in zip(prompts, answers):
+                    if client.cache is not None and answer:
+                        client._cache_put(
+                            client._cache_key(client._build_messages(prompt)), answer
+                        )
+            else:
+                answers = await asyncio.gather(
+                    *(
+                        client.acall(prompt=prompt, _bypass_coalesce=True)
+                        for prompt in prompts
+                    ),
+                    return_exceptions=True,
+                )
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), answer in zip(pending, answers):
+            if future.done():
+                continue
+            if isinstance(answer, Exception):
+                future.set_exception(answer)
+            else:
+                future.set_result(answer)
+
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Min seconds between streaming progress reports, so long generations do not
+# flood the reporter with one line per chunk.
+STREAM_REPORT_INTERVAL = 0.1
+
+try:
+    import h2  # noqa: F401
+
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+_POOL_LIMITS = httpx.Limits(max_connections=256, max_keepalive_connections=128)
+_SYNC_HTTPX_POOLS = {}
+_ASYNC_HTTPX_POOLS = {}
+
+
+def _get_http_pool(base_url: str, api_key: str, asynchronous: bool):
+    """
+    Returns a shared httpx client for the endpoint, so every OpenAIClient
+    targeting the same base_url/api_key reuses one keepalive connection pool
+    instead of performing its own TCP/TLS handshakes.
+
+    Async pools are additionally keyed by the running event loop: an
+    httpx.AsyncClient binds its transport to the loop it first sends on, and
+    reusing it from a later loop (e.g. successive asyncio.run calls) fails
+    with "Event loop is closed". Pools whose loop has since closed are
+    dropped; their sockets cannot be closed gracefully anymore and are left
+    to the garbage collector.
+    """
+    if asynchronous:
+        pools = _ASYNC_HTTPX_POOLS
+        for stale in [k for k in pools if k[0].is_closed()]:
+            del pools[stale]
+        key = (asyncio.get_running_loop(), base_url, api_key)
+    else:
+        pools = _SYNC_HTTPX_POOLS
+        key = (base_url, api_key)
+    if key not in pools:
+        client_cls = httpx.AsyncClient if asynchronous else httpx.Client
+        pools[key] = client_cls(http2=_HTTP2_AVAILABLE, limits=_POOL_LIMITS)
+    return pools[key]
+
+
+_BACKGROUND_LOOP = None
+_BACKGROUND_LOOP_LOCK = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the shared event loop running in a daemon thread that serves
+    synchronous calls, so sync callers reuse the async code path.
+    """
+    global _BACKGROUND_LOOP
+    with _BACKGROUND_LOOP_LOCK:
+        if _BACKGROUND_LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="kag-llm-loop", daemon=True
+            ).start()
+            _BACKGROUND_LOOP = loop
+    return _BACKGROUND_LOOP
+
+
+@atexit.register
+def _close_http_pools():
+    for pool in _SYNC_HTTPX_POOLS.values():
+        try:
+            pool.close()
+        except Exception:
+            pass
+    for (loop, _, _), pool in list(_ASYNC_HTTPX_POOLS.items()):
+        if loop.is_closed():
+            continue
+        try:
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(pool.aclose(), loop).result(timeout=5)
+            else:
+                loop.run_until_complete(pool.aclose())
+        except Exception:
+            pass
+
+
 @LLMClient.register("maas")
 @LLMClient.register("openai")
 @LLMClient.register("vllm")
@@ -49,6 +302,20 @@ class OpenAIClient(LLMClient):
         max_rate: float = 1000,
         time_period: float = 1,
         think: bool = False,
+        enable_cache: bool = True,
+        cache_size: int = 4096,
+        max_concurrent: int = None,
+        max_retries: int = 3,
+        max_token_rate: float = None,
+        token_burst: float = None,
+        system_prompt: str = "you are a helpful assistant",
+        enable_coalescing: bool = False,
+        coalesce_window_ms: float = 10.0,
+        coalesce_max_batch: int = 6,
+        fast_sse: bool = False,
+        weak_model: str = None,
+        router: Callable = None,
+        check_on_init: bool = False,
         **kwargs,
     ):
         """
@@ -61,6 +328,42 @@ class OpenAIClient(LLMClient):
             stream (bool, optional): Whether to stream the response. Defaults to False.
             temperature (float, optional): The temperature parameter for the model. Defaults to 0.7.
             timeout (float): The timeout duration for the service request. Defaults to None, means no timeout.
+            enable_cache (bool, optional): Whether to cache responses of non-streaming,
+                tool-free requests in a process-local LRU cache. Defaults to True.
+            cache_size (int, optional): Max number of cached responses. Defaults to 4096.
+            max_concurrent (int, optional): Max in-flight async requests. Defaults to max_rate.
+            max_retries (int, optional): Attempts for requests failing with retryable
+                errors (429/5xx, connection errors, timeouts). Values below 1
+                are clamped to 1, i.e. a single attempt. Defaults to 3.
+            max_token_rate (float, optional): Token throughput limit (tokens/second)
+                enforced by a token bucket shared across clients with the same
+                base_url and api_key. Defaults to None, means unlimited.
+            token_burst (float, optional): Burst capacity of the token bucket.
+                Defaults to max_token_rate.
+            system_prompt (str, optional): The system message sent with every
+                request. Long, stable system prompts benefit from provider-side
+                prefix caching, which keys on byte-equal prefixes.
+            enable_coalescing (bool, optional): Whether concurrent plain-text
+                acall requests arriving within coalesce_window_ms are merged
+                into one batched completion. Changes how prompts are presented
+                to the model, so it is opt-in. Defaults to False.
+            coalesce_window_ms (float, optional): Coalescing window. Defaults to 10.
+            coalesce_max_batch (int, optional): Max requests merged into one
+                completion. Defaults to 6.
+            fast_sse (bool, optional): Whether streaming requests read SSE
+                frames off the raw httpx response and decode only the content
+                field (with msgspec when installed), bypassing the SDK's
+                per-chunk pydantic validation. Retries do not apply on this
+                path. Defaults to False.
+            weak_model (str, optional): A cheaper model that short, plain
+                prompts (see _is_simple) are routed to. Defaults to None,
+                means all requests use `model`.
+            router (Callable, optional): A callable (prompt, messages) -> model
+                name that overrides the built-in routing heuristic.
+            check_on_init (bool, optional): Whether to run the config check in
+                __init__ as before; otherwise it is deferred to first use so
+                building many clients does not serialize on probe requests.
+                Defaults to False.
         """
         name = kwargs.pop("name", None)
         if not name:
@@ -73,85 +376,249 @@ class OpenAIClient(LLMClient):
         self.temperature = temperature
         self.timeout = timeout
         self.think = think
-        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
-        self.aclient = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
-        self.check()
+        self.cache = (
+            RESPONSE_CACHE_MANAGER.get_cache(name, cache_size) if enable_cache else None
+        )
+        self.max_concurrent = int(max_concurrent or max_rate)
+        # Clamped so the retry loop always runs the first attempt; with a
+        # value below 1 it would silently return None instead of a response.
+        self.max_retries = max(1, int(max_retries))
+        # Static request parts, built once instead of per call. The system
+        # message template is frozen: an accidental mutation would change the
+        # request prefix and silently break provider-side prefix caching.
+        self.system_prompt = system_prompt
+        self._system_msg = types.MappingProxyType(
+            {"role": "system", "content": system_prompt}
+        )
+        self._extra_body = {"chat_template_kwargs": {"enable_thinking": self.think}}
+        self._max_tokens_arg = self.max_tokens if self.max_tokens > 0 else NOT_GIVEN
+        # Per-event-loop semaphores: a client may serve both the shared
+        # background loop (sync callers) and a caller's own loop, and an
+        # asyncio.Semaphore must not be shared between loops.
+        self._sems = {}
+        # Async SDK clients are per loop too, see the `aclient` property.
+        self._aclients = {}
+        self.enable_coalescing = enable_coalescing
+        self.coalesce_window = coalesce_window_ms / 1000.0
+        self.coalesce_max_batch = coalesce_max_batch
+        self.fast_sse = fast_sse
+        self.weak_model = weak_model
+        self.router = router
+        # Coalescers are also per event loop, see _Coalescer.
+        self._coalescers = {}
+        self._token_bucket = (
+            TOKEN_BUCKET_MANAGER.get_bucket(
+                f"{base_url}#{api_key}", max_token_rate, token_burst
+            )
+            if max_token_rate
+            else None
+        )
+        self._encoder = None
+        if tiktoken is not None:
+            try:
+                self._encoder = tiktoken.encoding_for_model(model)
+            except Exception:
+                # Raises KeyError for unrecognized model names, but can also
+                # fail with network/IO errors when the BPE files are not
+                # cached locally (e.g. offline deployments); either way fall
+                # back instead of failing construction.
+                try:
+                    self._encoder = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    pass
+        if check_on_init:
+            self.check()
+            self._checked = True
         logger.debug(
             f"Initialize OpenAIClient with rate limit {max_rate} every {time_period}s"
         )
         logger.info(f"OpenAIClient max_tokens={self.max_tokens}")
 
-    def __call__(self, prompt: str = "", image_url: str = None, **kwargs):
+    @cached_property
+    def client(self):
+        """The sync SDK client, built on first access (only the Batch API uses it)."""
+        return OpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            http_client=_get_http_pool(self.base_url, self.api_key, False),
+        )
+
+    @property
+    def aclient(self):
         """
-        Executes a model request when the object is called and returns the result.
+        The async SDK client for the running event loop, built on first access.
 
-        Parameters:
-            prompt (str): The prompt provided to the model.
+        One client per loop (like `_sems`): the httpx pool underneath is
+        loop-bound, and the same OpenAIClient may serve both the shared
+        background loop and a caller's own loop.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._aclients.get(loop)
+        if client is None:
+            client = self._aclients[loop] = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=_get_http_pool(self.base_url, self.api_key, True),
+            )
+        return client
 
-        Returns:
-            str: The response content generated by the model.
+    def _count_tokens(self, text: str) -> int:
         """
-        # Call the model with the given prompt and return the response
-        reporter: Optional[ReporterABC] = kwargs.get("reporter", None)
-        segment_name = kwargs.get("segment_name", None)
-        tag_name = kwargs.get("tag_name", None)
-        tools = kwargs.get("tools", None)
-        messages = kwargs.get("messages", None)
-        if messages is None:
-            if image_url:
-                messages = [
-                    {"role": "system", "content": "you are a helpful assistant"},
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": {"url": image_url}},
-                        ],
-                    },
-                ]
-            else:
-                messages = [
-                    {"role": "system", "content": "you are a helpful assistant"},
-                    {"role": "user", "content": prompt},
-                ]
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            stream=self.stream,
-            temperature=self.temperature,
-            timeout=self.timeout,
-            tools=tools,
-            max_tokens=self.max_tokens if self.max_tokens > 0 else NOT_GIVEN,
-            extra_body={"chat_template_kwargs": {"enable_thinking": self.think}},
+        Counts prompt tokens with the encoder cached at construction time.
+        Short texts (and setups without tiktoken) use the ~4 chars/token
+        heuristic, which is cheaper than a BPE encode and accurate enough.
+        """
+        if self._encoder is not None and len(text) > 256:
+            return len(self._encoder.encode_ordinary(text))
+        return len(text) // 4
+
+    def _estimate_tokens(self, messages) -> int:
+        """Estimated request cost: prompt tokens plus the completion budget."""
+        text = _stable_dumps(messages).decode("utf-8")
+        return self._count_tokens(text) + max(self.max_tokens, 0)
+
+    def _get_sem(self) -> asyncio.Semaphore:
+        """The max_concurrent semaphore for the running event loop."""
+        loop = asyncio.get_running_loop()
+        sem = self._sems.get(loop)
+        if sem is None:
+            sem = self._sems[loop] = asyncio.Semaphore(self.max_concurrent)
+        return sem
+
+    async def _acreate_with_retry(self, **request_kwargs):
+        """
+        Issues a chat completion under the concurrency semaphore, retrying
+        retryable failures (429/5xx, connection errors, timeouts) with
+        exponential backoff plus jitter. Honors the Retry-After header when
+        the server provides one.
+        """
+        if self._token_bucket is not None:
+            await self._token_bucket.aacquire(
+                self._estimate_tokens(request_kwargs.get("messages", []))
+            )
+        async with self._get_sem():
+            return await self._acreate_attempts(**request_kwargs)
+
+    async def _astream_with_retry(self, **request_kwargs) -> AsyncIterator[str]:
+        """
+        Yields content deltas from an SDK streaming completion, holding a
+        max_concurrent slot until the stream is exhausted so streamed requests
+        count against the cap for their whole lifetime, like
+        `_astream_deltas_raw`. Retries cover only the initial request; a
+        stream failing midway is not replayed.
+        """
+        if self._token_bucket is not None:
+            await self._token_bucket.aacquire(
+                self._estimate_tokens(request_kwargs.get("messages", []))
+            )
+        async with self._get_sem():
+            response = await self._acreate_attempts(**request_kwargs)
+            async for delta_content in self._astream_deltas(response):
+                yield delta_content
+
+    async def _acreate_attempts(self, **request_kwargs):
+        """The bare retry loop; callers hold the semaphore."""
+        for attempt in range(self.max_retries):
+            try:
+                return await self.aclient.chat.completions.create(**request_kwargs)
+            except (APIConnectionError, APITimeoutError, APIStatusError) as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if status is not None and status not in RETRYABLE_STATUS_CODES:
+                    raise
+                if attempt + 1 >= self.max_retries:
+                    raise
+                delay = min(30.0, 2.0**attempt) + random.random()
+                headers = getattr(getattr(e, "response", None), "headers", None)
+                if headers and headers.get("retry-after"):
+                    try:
+                        delay = max(delay, float(headers.get("retry-after")))
+                    except ValueError:
+                        pass
+                logger.info(
+                    f"retryable error from {self.model} (attempt {attempt + 1}/"
+                    f"{self.max_retries}), sleeping {delay:.1f}s: {e}"
+                )
+                await asyncio.sleep(delay)
+
+    def _is_simple(self, prompt: str) -> bool:
+        """Heuristic for prompts a cheaper model can handle."""
+        return len(prompt) < 512 and not self.think
+
+    def _choose_model(self, prompt, messages=None, image_url=None, tools=None):
+        """
+        Picks the model for a request, downgrading short, plain prompts to
+        `weak_model` when one is configured.
+        """
+        if self.router is not None:
+            return self.router(prompt, messages) or self.model
+        if (
+            self.weak_model
+            and messages is None
+            and not image_url
+            and not tools
+            and self._is_simple(prompt)
+        ):
+            return self.weak_model
+        return self.model
+
+    def _cache_key(self, messages, model: str = None):
+        payload = _stable_dumps(
+            [
+                messages,
+                model or self.model,
+                self.temperature,
+                self.max_tokens,
+                self.think,
+            ]
         )
-        if not self.stream:
-            # reasoning_content = getattr(
-            #     response.choices[0].message, "reasoning_content", None
-            # )
-            # content = response.choices[0].message.content
-            # if reasoning_content:
-            #     rsp = f"{reasoning_content}\n{content}"
-            # else:
-            #     rsp = content
-            rsp = response.choices[0].message.content
-            tool_calls = response.choices[0].message.tool_calls
-        else:
-            rsp = ""
-            tool_calls = None  # TODO: Handle tool calls in stream mode
-
-            for chunk in response:
-                if not chunk.choices:
-                    continue
-                delta_content = getattr(chunk.choices[0].delta, "content", None)
-                if delta_content is not None:
-                    rsp += delta_content
-                    if reporter:
-                        reporter.add_report_line(
-                            segment_name,
-                            tag_name,
-                            rsp,
-                            status="RUNNING",
-                        )
+        return hashlib.blake2b(payload).hexdigest()
+
+    def _cache_get(self, messages, tools, model: str = None):
+        """
+        Returns (key, cached_response); key is None when the request is not cacheable
+        (streaming or tool-augmented), cached_response is None on a cache miss.
+        """
+        if self.cache is None or self.stream or tools:
+            return None, None
+        key = self._cache_key(messages, model)
+        exc = self.cache.get_error(key)
+        if exc is not None:
+            logger.info(f"negative cache hit, failing fast: {exc}")
+            raise exc
+        return key, self.cache.get(key)
+
+    def _cache_put(self, key, rsp):
+        if key is not None and rsp:
+            self.cache.put(key, rsp)
+
+    def _cache_put_error(self, key, exc):
+        if self.cache is not None and key is not None:
+            self.cache.put_error(key, exc)
+
+    def clear_error_cache(self):
+        """Clears cached permanent failures so affected prompts run again."""
+        if self.cache is not None:
+            self.cache.clear_errors()
+
+    async def _aparse_stream(self, deltas, reporter, segment_name, tag_name):
+        """Accumulates a stream of content deltas, throttling reporter updates."""
+        parts = []
+        add_part = parts.append
+        monotonic = time.monotonic
+        last_emit = 0.0
+        async for delta_content in deltas:
+            add_part(delta_content)
+            if reporter:
+                now = monotonic()
+                if now - last_emit > STREAM_REPORT_INTERVAL:
+                    last_emit = now
+                    reporter.add_report_line(
+                        segment_name,
+                        tag_name,
+                        "".join(parts),
+                        status="RUNNING",
+                    )
+        rsp = "".join(parts)
         if reporter:
             reporter.add_report_line(
                 segment_name,
@@ -159,11 +626,29 @@ class OpenAIClient(LLMClient):
                 rsp,
                 status="FINISH",
             )
-        if tools and tool_calls:
-            return response.choices[0].message
-
         return rsp
 
+    def __call__(self, prompt: str = "", image_url: str = None, **kwargs):
+        """
+        Executes a model request when the object is called and returns the result.
+
+        The request runs as `acall` on the shared background event loop, so
+        sync callers go through the same connection pool, cache, rate limiter
+        and retry logic as async ones. The per-request timeout is enforced
+        inside `acall` by the SDK.
+
+        Parameters:
+            prompt (str): The prompt provided to the model.
+
+        Returns:
+            str: The response content generated by the model.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.acall(prompt=prompt, image_url=image_url, **kwargs),
+            _get_background_loop(),
+        )
+        return future.result()
+
     async def acall(self, prompt: str = "", image_url: str = None, **kwargs):
         """
         Executes a model request when the object is called and returns the result.
@@ -175,9 +660,11 @@ class OpenAIClient(LLMClient):
             str: The response content generated by the model.
         """
         # Call the model with the given prompt and return the response
-        reporter: Optional[ReporterABC] = kwargs.get("reporter", None)
-        segment_name = kwargs.get("segment_name", None)
-        tag_name = kwargs.get("tag_name", None)
+        await self._ensure_checked()
+        bypass_coalesce = kwargs.pop("_bypass_coalesce", False)
+        reporter, segment_name, tag_name, tools, messages = self._extract_call_kwargs(
+            kwargs
+        )
         if reporter:
             reporter.add_report_line(
                 segment_name,
@@ -185,72 +672,379 @@ class OpenAIClient(LLMClient):
                 "",
                 status="INIT",
             )
+        chosen_model = self._choose_model(prompt, messages, image_url, tools)
+        coalescible = (
+            self.enable_coalescing
+            and not bypass_coalesce
+            and not self.stream
+            and tools is None
+            and reporter is None
+            and messages is None
+            and not image_url
+            and chosen_model == self.model
+        )
+        messages = self._build_messages(prompt, image_url, messages)
+        cache_key, cached = self._cache_get(messages, tools, chosen_model)
+        if cached is not None:
+            if reporter:
+                reporter.add_report_line(
+                    segment_name,
+                    tag_name,
+                    cached,
+                    status="FINISH",
+                )
+            return cached
+        if coalescible:
+            return await self._get_coalescer().submit(prompt)
+        if self.stream:
+            # TODO: Handle tool calls in stream mode
+            request_kwargs = dict(
+                model=chosen_model,
+                messages=messages,
+                stream=True,
+                temperature=self.temperature,
+                timeout=self.timeout,
+                tools=tools,
+                max_tokens=self._max_tokens_arg,
+                extra_body=self._extra_body,
+            )
+            deltas = (
+                self._astream_deltas_raw(**request_kwargs)
+                if self.fast_sse
+                else self._astream_with_retry(**request_kwargs)
+            )
+            return await self._aparse_stream(deltas, reporter, segment_name, tag_name)
+        try:
+            response = await self._acreate_with_retry(
+                model=chosen_model,
+                messages=messages,
+                stream=False,
+                temperature=self.temperature,
+                timeout=self.timeout,
+                tools=tools,
+                max_tokens=self._max_tokens_arg,
+                extra_body=self._extra_body,
+            )
+        except BadRequestError as e:
+            # Permanent failures (context overflow, content policy) are cached
+            # briefly so identical requests fail fast; transient errors such as
+            # rate limits and timeouts are never recorded.
+            self._cache_put_error(cache_key, e)
+            raise
+        rsp = self._parse_response(response, tools, reporter, segment_name, tag_name)
+        if isinstance(rsp, str):
+            self._cache_put(cache_key, rsp)
+        return rsp
 
-        tools = kwargs.get("tools", None)
-        messages = kwargs.get("messages", None)
-        if messages is None:
-            if image_url:
-                messages = [
-                    {"role": "system", "content": "you are a helpful assistant"},
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": {"url": image_url}},
-                        ],
-                    },
-                ]
+    def _get_coalescer(self):
+        loop = asyncio.get_running_loop()
+        coalescer = self._coalescers.get(loop)
+        if coalescer is None:
+            coalescer = self._coalescers[loop] = _Coalescer(
+                self, self.coalesce_window, self.coalesce_max_batch
+            )
+        return coalescer
 
-            else:
-                messages = [
-                    {"role": "system", "content": "you are a helpful assistant"},
-                    {"role": "user", "content": prompt},
-                ]
-        response = await self.aclient.chat.completions.create(
-            model=self.model,
+    async def _astream_deltas(self, response) -> AsyncIterator[str]:
+        """Yields non-empty content deltas from a streaming chat completion."""
+        async for chunk in response:
+            choices = chunk.choices
+            if not choices:
+                continue
+            # ChoiceDelta.content is a declared pydantic field that always
+            # exists, so plain attribute access beats getattr-with-default.
+            delta_content = choices[0].delta.content
+            if delta_content:
+                yield delta_content
+
+    async def _astream_deltas_raw(self, **request_kwargs) -> AsyncIterator[str]:
+        """
+        Yields content deltas by reading SSE frames off the raw httpx response
+        and decoding only the content field, skipping the SDK's per-chunk
+        pydantic validation. Tool-call deltas are not surfaced, matching the
+        regular streaming path. The request holds a max_concurrent slot for
+        the whole stream; retries do not apply on this path.
+        """
+        if self._token_bucket is not None:
+            await self._token_bucket.aacquire(
+                self._estimate_tokens(request_kwargs.get("messages", []))
+            )
+        async with self._get_sem():
+            async with self.aclient.chat.completions.with_streaming_response.create(
+                **request_kwargs
+            ) as response:
+                async for line in response.iter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[6:].strip()
+                    if not data or data == "[DONE]":
+                        continue
+                    delta_content = _decode_sse_content(data)
+                    if delta_content:
+                        yield delta_content
+
+    async def acall_stream(
+        self, prompt: str = "", image_url: str = None, **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        Streams a model response, yielding content deltas as they arrive.
+
+        Unlike `acall` in streaming mode, nothing is buffered; callers can pipe
+        tokens straight to SSE or any other consumer.
+
+        Parameters:
+            prompt (str): The prompt provided to the model.
+
+        Yields:
+            str: Content deltas of the model response.
+        """
+        await self._ensure_checked()
+        raw_messages = kwargs.get("messages", None)
+        tools = kwargs.get("tools", None)
+        chosen_model = self._choose_model(prompt, raw_messages, image_url, tools)
+        messages = self._build_messages(prompt, image_url, raw_messages)
+        request_kwargs = dict(
+            model=chosen_model,
             messages=messages,
-            stream=self.stream,
+            stream=True,
             temperature=self.temperature,
             timeout=self.timeout,
             tools=tools,
-            max_tokens=self.max_tokens if self.max_tokens > 0 else NOT_GIVEN,
-            extra_body={"chat_template_kwargs": {"enable_thinking": self.think}},
+            max_tokens=self._max_tokens_arg,
+            extra_body=self._extra_body,
         )
-        if not self.stream:
-            # reasoning_content = getattr(
-            #     response.choices[0].message, "reasoning_content", None
-            # )
-            # if reasoning_content:
-            #     rsp = f"{reasoning_content}\n{content}"
-            # else:
-            rsp = response.choices[0].message.content
-            tool_calls = response.choices[0].message.tool_calls
-        else:
-            rsp = ""
-            tool_calls = None
-            async for chunk in response:
-                if not chunk.choices:
-                    continue
-                delta_content = getattr(chunk.choices[0].delta, "content", None)
-                if delta_content is not None:
-                    rsp += delta_content
-                if reporter:
-                    reporter.add_report_line(
-                        segment_name,
-                        tag_name,
-                        rsp,
-                        status="RUNNING",
-                    )
-        if reporter:
-            reporter.add_report_line(
-                segment_name,
-                tag_name,
-                rsp,
-                status="FINISH",
+        deltas = (
+            self._astream_deltas_raw(**request_kwargs)
+            if self.fast_sse
+            else self._astream_with_retry(**request_kwargs)
+        )
+        async for delta_content in deltas:
+            yield delta_content
+
+    async def _acall_batch(self, prompts: List[str]):
+        """
+        Answers several prompts with a single chat completion by numbering them in
+        one user message and requesting a JSON array back.
+
+        Returns the list of answers aligned with `prompts`, or None when the
+        request or the JSON parse fails so the caller can fall back to
+        single-prompt calls.
+        """
+        numbered = "\n".join(f"{idx + 1}. {p}" for idx, p in enumerate(prompts))
+        instruction = (
+            f"Answer each of the following {len(prompts)} inputs independently. "
+            'Return a JSON object of the form {"answers": ["answer to input 1", '
+            f'"answer to input 2", ...]}} with exactly {len(prompts)} elements.\n'
+            f"{numbered}"
+        )
+        messages = [dict(self._system_msg), {"role": "user", "content": instruction}]
+        try:
+            response = await self._acreate_with_retry(
+                model=self.model,
+                messages=messages,
+                stream=False,
+                temperature=self.temperature,
+                timeout=self.timeout,
+                max_tokens=self._max_tokens_arg,
+                response_format={"type": "json_object"},
+                extra_body=self._extra_body,
             )
-        if tools and tool_calls:
-            return response.choices[0].message
-        return rsp
+            parsed = loads(response.choices[0].message.content)
+        except Exception as e:
+            logger.info(
+                f"batched completion failed, will fall back to single calls: {e}"
+            )
+            return None
+        if isinstance(parsed, dict):
+            parsed = parsed.get("answers")
+        if not isinstance(parsed, list) or len(parsed) != len(prompts):
+            return None
+        return [
+            a if isinstance(a, str) else json.dumps(a, ensure_ascii=False)
+            for a in parsed
+        ]
+
+    async def acall_many(
+        self,
+        prompts: List[str],
+        batch_size: int = 6,
+        robust: bool = False,
+        **kwargs,
+    ) -> List[str]:
+        """
+        Executes many prompts, packing them into batched chat completions.
+
+        Prompts are grouped into batches of `batch_size` and each batch is sent
+        as one request; batches run concurrently. A batch whose JSON answer
+        cannot be parsed falls back to per-prompt `acall`.
+
+        Args:
+            prompts (List[str]): The prompts to answer.
+            batch_size (int, optional): Max prompts packed per request. Defaults to 6.
+            robust (bool, optional): When True, each batch is also issued in a
+                permuted order and answers that disagree between the two runs are
+                re-answered with a single-prompt call. Defaults to False.
+            **kwargs: Forwarded to per-prompt `acall`. Arguments like tools or
+                a reporter cannot be applied to a packed batch request, so when
+                any are given batching is skipped and every prompt runs through
+                `acall` individually.
+
+        Returns:
+            List[str]: Responses aligned with the input prompts.
+        """
+        prompts = list(prompts)
+        if not prompts:
+            return []
+        if len(prompts) == 1:
+            return [await self.acall(prompt=prompts[0], **kwargs)]
+        if kwargs:
+            # A packed batch request cannot carry these arguments, and applying
+            # them only when a batch falls back to single calls would make
+            # behavior depend on whether the batch parsed. Run everything
+            # through acall so every prompt is treated identically.
+            return list(
+                await asyncio.gather(*(self.acall(prompt=p, **kwargs) for p in prompts))
+            )
+        results = [None] * len(prompts)
+
+        async def run_batch(indices):
+            batch = [prompts[i] for i in indices]
+            answers = await self._acall_batch(batch)
+            if answers is not None and robust:
+                order = random.sample(range(len(batch)), len(batch))
+                permuted = await self._acall_batch([batch[j] for j in order])
+                if permuted is not None:
+                    realigned = [None] * len(batch)
+                    for pos, j in enumerate(order):
+                        realigned[j] = permuted[pos]
+                    disagreed = [
+                        j for j in range(len(batch)) if answers[j] != realigned[j]
+                    ]
+                    if disagreed:
+                        redone = await asyncio.gather(
+                            *(self.acall(prompt=batch[j]) for j in disagreed)
+                        )
+                        for j, rsp in zip(disagreed, redone):
+                            answers[j] = rsp
+            if answers is None:
+                answers = await asyncio.gather(*(self.acall(prompt=p) for p in batch))
+            for i, rsp in zip(indices, answers):
+                results[i] = rsp
+
+        # Dispatch prompts sharing a prefix (e.g. the same few-shot preamble)
+        # temporally close together, which raises server-side KV/prefix-cache
+        # hit rates on mixed workloads. Results stay input-aligned because
+        # run_batch writes through the original indices.
+        order = sorted(range(len(prompts)), key=lambda i: prompts[i][:2048])
+        batches = [
+            order[start : start + batch_size]
+            for start in range(0, len(prompts), batch_size)
+        ]
+        await asyncio.gather(*(run_batch(indices) for indices in batches))
+        return results
+
+    def _batch_entry(self, custom_id: str, prompt: str) -> dict:
+        """Builds one /v1/chat/completions line of a Batch API input file."""
+        body = {
+            "model": self.model,
+            "messages": self._build_messages(prompt),
+            "temperature": self.temperature,
+        }
+        if self.max_tokens > 0:
+            body["max_tokens"] = self.max_tokens
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": body,
+        }
+
+    def submit_batch(self, requests: Iterable[Union[str, dict]]) -> str:
+        """
+        Submits requests to the OpenAI Batch API and returns the batch id.
+
+        Batch completions run offline at a 50% discount with much higher rate
+        limits, so this is the preferred path for non-real-time workloads.
+        Entries may be plain prompts, which are wrapped into chat completion
+        requests with custom_id "request-<index>", or fully-formed Batch API
+        dicts with their own custom_id.
+
+        Args:
+            requests (Iterable[Union[str, dict]]): Prompts or Batch API entries.
+
+        Returns:
+            str: The id of the created batch, to pass to `poll_batch`.
+        """
+        buf = io.BytesIO()
+        for idx, request in enumerate(requests):
+            if isinstance(request, str):
+                request = self._batch_entry(f"request-{idx}", request)
+            buf.write(json.dumps(request, ensure_ascii=False).encode("utf-8"))
+            buf.write(b"\n")
+        buf.seek(0)
+        batch_file = self.client.files.create(file=buf, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        logger.info(f"submitted batch {batch.id} (input file {batch_file.id})")
+        return batch.id
+
+    async def poll_batch(self, batch_id: str, poll_interval: float = 30.0):
+        """
+        Waits for a submitted batch to finish and yields its results.
+
+        Args:
+            batch_id (str): Batch id returned by `submit_batch`.
+            poll_interval (float, optional): Seconds between status checks.
+                Defaults to 30.
+
+        Yields:
+            tuple: (custom_id, response content) pairs, in output file order.
+
+        Raises:
+            RuntimeError: If the batch finishes in a non-completed state.
+        """
+        while True:
+            batch = await self.aclient.batches.retrieve(batch_id)
+            if batch.status in {"completed", "failed", "expired", "cancelled"}:
+                break
+            await asyncio.sleep(poll_interval)
+        if batch.status != "completed":
+            raise RuntimeError(f"batch {batch_id} finished with status {batch.status}")
+        output = await self.aclient.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            record = loads(line)
+            body = (record.get("response") or {}).get("body") or {}
+            choices = body.get("choices") or []
+            content = choices[0]["message"]["content"] if choices else None
+            yield record.get("custom_id"), content
+
+    async def acall_many_batch(
+        self, prompts: List[str], poll_interval: float = 30.0, **kwargs
+    ) -> List[str]:
+        """
+        Answers prompts through the Batch API when there are enough of them.
+
+        Workloads of at least KAG_AUTO_BATCH_THRESHOLD prompts (env var,
+        default 128) are routed through `submit_batch`/`poll_batch`; smaller
+        ones go through the real-time `acall_many` path.
+
+        Returns:
+            List[str]: Responses aligned with the input prompts.
+        """
+        prompts = list(prompts)
+        threshold = int(os.environ.get("KAG_AUTO_BATCH_THRESHOLD", "128"))
+        if len(prompts) < threshold:
+            return await self.acall_many(prompts, **kwargs)
+        batch_id = self.submit_batch(prompts)
+        results = {}
+        async for custom_id, content in self.poll_batch(batch_id, poll_interval):
+            results[custom_id] = content
+        return [results.get(f"request-{idx}") for idx in range(len(prompts))]
 
 
 @LLMClient.register("azure_openai")
@@ -269,6 +1063,7 @@ class AzureOpenAIClient(LLMClient):
         azure_ad_token_provider: AzureADTokenProvider = None,
         max_rate: float = 1000,
         time_period: float = 1,
+        check_on_init: bool = False,
         **kwargs,
     ):
         """
@@ -287,6 +1082,8 @@ class AzureOpenAIClient(LLMClient):
             azure_ad_token_provider: A function that returns an Azure Active Directory token, will be invoked on every request.
             azure_deployment: A model deployment, if given sets the base client URL to include `/deployments/{azure_deployment}`.
                 Note: this means you won't be able to use non-deployment endpoints. Not supported with Assistants APIs.
+            check_on_init (bool, optional): Whether to run the config check in
+                __init__; otherwise it is deferred to first use. Defaults to False.
         """
         name = kwargs.pop("name", None)
         if not name:
@@ -303,16 +1100,19 @@ class AzureOpenAIClient(LLMClient):
         self.api_version = api_version
         self.azure_ad_token = azure_ad_token
         self.azure_ad_token_provider = azure_ad_token_provider
-        self.client = AzureOpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url,
-            azure_deployment=self.azure_deployment,
-            model=self.model,
-            api_version=self.api_version,
-            azure_ad_token=self.azure_ad_token,
-            azure_ad_token_provider=self.azure_ad_token_provider,
+        # Async SDK clients are per event loop, see the `aclient` property.
+        self._aclients = {}
+        if check_on_init:
+            self.check()
+            self._checked = True
+        logger.debug(
+            f"Initialize AzureOpenAIClient with rate limit {max_rate} every {time_period}s"
         )
-        self.aclient = AsyncAzureOpenAI(
+
+    @cached_property
+    def client(self):
+        """The sync SDK client, built on first access."""
+        return AzureOpenAI(
             api_key=self.api_key,
             base_url=self.base_url,
             azure_deployment=self.azure_deployment,
@@ -322,10 +1122,27 @@ class AzureOpenAIClient(LLMClient):
             azure_ad_token_provider=self.azure_ad_token_provider,
         )
 
-        self.check()
-        logger.debug(
-            f"Initialize AzureOpenAIClient with rate limit {max_rate} every {time_period}s"
-        )
+    @property
+    def aclient(self):
+        """
+        The async SDK client for the running event loop, built on first access.
+
+        Per loop because the httpx transport underneath binds to the loop it
+        first sends on and cannot be reused after that loop closes.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._aclients.get(loop)
+        if client is None:
+            client = self._aclients[loop] = AsyncAzureOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                azure_deployment=self.azure_deployment,
+                model=self.model,
+                api_version=self.api_version,
+                azure_ad_token=self.azure_ad_token,
+                azure_ad_token_provider=self.azure_ad_token_provider,
+            )
+        return client
 
     def __call__(self, prompt: str = "", image_url: str = None, **kwargs):
         """
@@ -338,25 +1155,14 @@ class AzureOpenAIClient(LLMClient):
             str: The response content generated by the model.
         """
         # Call the model with the given prompt and return the response
-        tools = kwargs.get("tools", None)
-        messages = kwargs.get("messages", None)
-        if messages is None:
-            if image_url:
-                messages = [
-                    {"role": "system", "content": "you are a helpful assistant"},
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": {"url": image_url}},
-                        ],
-                    },
-                ]
-            else:
-                messages = [
-                    {"role": "system", "content": "you are a helpful assistant"},
-                    {"role": "user", "content": prompt},
-                ]
+        if not self._checked:
+            # set the flag first so the check's own probe call does not recurse
+            self._checked = True
+            self.check()
+        reporter, segment_name, tag_name, tools, messages = self._extract_call_kwargs(
+            kwargs
+        )
+        messages = self._build_messages(prompt, image_url, messages)
         response = self.client.chat.completions.create(
             model=self.model,
             messages=messages,
@@ -365,12 +1171,7 @@ class AzureOpenAIClient(LLMClient):
             timeout=self.timeout,
             max_tokens=self.max_tokens,
         )
-        rsp = response.choices[0].message.content
-        tool_calls = response.choices[0].message.tool_calls
-        if tools and tool_calls:
-            return response.choices[0].message
-
-        return rsp
+        return self._parse_response(response, tools, reporter, segment_name, tag_name)
 
     async def acall(self, prompt: str = "", image_url: str = None, **kwargs):
         """
@@ -383,26 +1184,11 @@ class AzureOpenAIClient(LLMClient):
             str: The response content generated by the model.
         """
         # Call the model with the given prompt and return the response
-        tools = kwargs.get("tools", None)
-        messages = kwargs.get("messages", None)
-        if messages is None:
-            if image_url:
-                messages = [
-                    {"role": "system", "content": "you are a helpful assistant"},
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": {"url": image_url}},
-                        ],
-                    },
-                ]
-
-            else:
-                messages = [
-                    {"role": "system", "content": "you are a helpful assistant"},
-                    {"role": "user", "content": prompt},
-                ]
+        await self._ensure_checked()
+        reporter, segment_name, tag_name, tools, messages = self._extract_call_kwargs(
+            kwargs
+        )
+        messages = self._build_messages(prompt, image_url, messages)
         response = await self.aclient.chat.completions.create(
             model=self.model,
             messages=messages,
@@ -411,12 +1197,7 @@ class AzureOpenAIClient(LLMClient):
             timeout=self.timeout,
             max_tokens=self.max_tokens,
         )
-        rsp = response.choices[0].message.content
-        tool_calls = response.choices[0].message.tool_calls
-
-        if tools and tool_calls:
-            return rsp.choices[0].message
-        return rsp
+        return self._parse_response(response, tools, reporter, segment_name, tag_name)
 
 
 if __name__ == "__main__":
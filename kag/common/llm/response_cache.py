@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Copyright 2023 OpenSPG Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License
+# is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+# or implied.
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    A bounded LRU cache for LLM responses.
+
+    Besides successful responses, permanent failures (e.g. context overflow,
+    content policy) can be recorded with a short TTL so identical requests
+    fail fast instead of re-running the full retry loop.
+
+    The lock is a plain ``threading.Lock`` because get/put never await; it is
+    therefore safe to share one cache between sync and async call paths.
+    """
+
+    def __init__(self, maxsize: int = 4096, negative_ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.negative_ttl = negative_ttl
+        self._data = OrderedDict()
+        self._neg_data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_error(self, key: str):
+        with self._lock:
+            item = self._neg_data.get(key)
+            if item is None:
+                return None
+            expiry, exc = item
+            if expiry < time.monotonic():
+                del self._neg_data[key]
+                return None
+            return exc
+
+    def put_error(self, key: str, exc: Exception):
+        with self._lock:
+            self._neg_data[key] = (time.monotonic() + self.negative_ttl, exc)
+            self._neg_data.move_to_end(key)
+            while len(self._neg_data) > self.maxsize:
+                self._neg_data.popitem(last=False)
+
+    def clear_errors(self):
+        with self._lock:
+            self._neg_data.clear()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._neg_data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class ResponseCacheManager:
+    def __init__(self):
+        self.cache_map = {}
+
+    def get_cache(self, name: str, maxsize: int = 4096):
+        if name not in self.cache_map:
+            self.cache_map[name] = ResponseCache(maxsize)
+        return self.cache_map[name]
+
+
+RESPONSE_CACHE_MANAGER = ResponseCacheManager()
@@ -10,9 +10,64 @@
 # is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
 # or implied.
 
+import asyncio
+import threading
+import time
+
 from aiolimiter import AsyncLimiter
 
 
+class TokenBucket:
+    """
+    A lazily refilled token bucket.
+
+    Tokens accrue continuously at `rate` per second up to `capacity`, so short
+    bursts up to the capacity pass without waiting. The balance may go negative
+    ("borrowing"): callers that overdraw are delayed until the refill covers
+    the deficit, which keeps concurrent acquirers correctly serialized.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, n: float) -> float:
+        """Takes n tokens and returns the seconds to wait before proceeding."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.last) * self.rate
+            )
+            self.last = now
+            self.tokens -= n
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self, n: float = 1.0):
+        delay = self._reserve(n)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, n: float = 1.0):
+        delay = self._reserve(n)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class TokenBucketManager:
+    def __init__(self):
+        self.bucket_map = {}
+
+    def get_bucket(self, name: str, rate: float, capacity: float = None):
+        if name not in self.bucket_map:
+            self.bucket_map[name] = TokenBucket(rate, capacity)
+        return self.bucket_map[name]
+
+
 class RateLimiterManger:
     def __init__(self):
         self.limiter_map = {}
@@ -27,3 +82,4 @@ class RateLimiterManger:
 
 
 RATE_LIMITER_MANGER = RateLimiterManger()
+TOKEN_BUCKET_MANAGER = TokenBucketManager()
@@ -32,6 +32,8 @@ class LLMClient(Registrable):
     This class includes methods to call the model with a prompt, parse the response, and handle batch processing of prompts.
     """
 
+    _system_msg = {"role": "system", "content": "you are a helpful assistant"}
+
     def __init__(
         self, name: str, max_rate: float = 1000, time_period: float = 1, **kwargs
     ):
@@ -39,6 +41,62 @@ class LLMClient(Registrable):
         self.limiter = RATE_LIMITER_MANGER.get_rate_limiter(name, max_rate, time_period)
         self.enable_check = kwargs.get("enable_check", True)
         self.max_tokens = kwargs.get("max_tokens", 8192)
+        self._checked = False
+
+    @staticmethod
+    def _extract_call_kwargs(kwargs):
+        """
+        Pops the optional call arguments shared by all clients, returning
+        (reporter, segment_name, tag_name, tools, messages).
+        """
+        return (
+            kwargs.pop("reporter", None),
+            kwargs.pop("segment_name", None),
+            kwargs.pop("tag_name", None),
+            kwargs.pop("tools", None),
+            kwargs.pop("messages", None),
+        )
+
+    def _build_messages(self, prompt: str = "", image_url: str = None, messages=None):
+        """
+        Builds the chat messages for a request unless the caller already
+        supplied them. The system message template is copied so callers can
+        never mutate the shared (possibly frozen) instance.
+        """
+        if messages is not None:
+            return messages
+        if image_url:
+            return [
+                dict(self._system_msg),
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {"type": "image_url", "image_url": {"url": image_url}},
+                    ],
+                },
+            ]
+        return [dict(self._system_msg), {"role": "user", "content": prompt}]
+
+    def _parse_response(
+        self, response, tools=None, reporter=None, segment_name=None, tag_name=None
+    ):
+        """
+        Extracts the reply from a non-streaming chat completion response,
+        returning the full message when tool calls were requested and made.
+        """
+        message = response.choices[0].message
+        rsp = message.content
+        if reporter:
+            reporter.add_report_line(
+                segment_name,
+                tag_name,
+                rsp,
+                status="FINISH",
+            )
+        if tools and message.tool_calls:
+            return message
+        return rsp
 
     @retry(
         stop=stop_after_attempt(3),
@@ -371,3 +429,40 @@ class LLMClient(Registrable):
             except Exception as e:
                 logger.error("LLM config check failed!")
                 raise e
+
+    async def _acheck(self):
+        """Async variant of `check`, probing the service with a tiny request."""
+        if not self.enable_check:
+            return
+        from kag.common.conf import KAG_PROJECT_CONF
+
+        if (
+            hasattr(KAG_PROJECT_CONF, "llm_config_check")
+            and KAG_PROJECT_CONF.llm_config_check
+        ):
+            try:
+                await self.acall("Are you OK?")
+            except Exception as e:
+                logger.error("LLM config check failed!")
+                raise e
+
+    async def _ensure_checked(self):
+        """
+        Runs the config check once, on first use. The flag is set before the
+        probe so the probe's own acall does not recurse into the check.
+        """
+        if self._checked:
+            return
+        self._checked = True
+        await self._acheck()
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        """
+        Builds a client and awaits its config check before returning, so many
+        clients can be constructed concurrently via asyncio.gather instead of
+        serial blocking probes in __init__.
+        """
+        client = cls(*args, **kwargs)
+        await client._ensure_checked()
+        return client
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from kag.common.llm.response_cache import (
+    ResponseCache,
+    RESPONSE_CACHE_MANAGER,
+)
+
+
+def test_response_cache_lru_eviction():
+    cache = ResponseCache(maxsize=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    # "b" is now the least recently used entry and should be evicted
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert len(cache) == 2
+
+
+def test_response_cache_negative_entries_expire():
+    cache = ResponseCache(maxsize=2, negative_ttl=60.0)
+    exc = ValueError("bad prompt")
+    cache.put_error("k", exc)
+    assert cache.get_error("k") is exc
+    # expire the entry by rewinding its expiry timestamp
+    with cache._lock:
+        expiry, stored = cache._neg_data["k"]
+        cache._neg_data["k"] = (expiry - 120.0, stored)
+    assert cache.get_error("k") is None
+    cache.put_error("k", exc)
+    cache.clear_errors()
+    assert cache.get_error("k") is None
+
+
+def test_response_cache_manager_shares_instances():
+    cache1 = RESPONSE_CACHE_MANAGER.get_cache("test_shared_cache")
+    cache2 = RESPONSE_CACHE_MANAGER.get_cache("test_shared_cache")
+    assert cache1 is cache2
+    cache1.put("key", "value")
+    assert cache2.get("key") == "value"
+    cache1.clear()